@@ -1,17 +1,90 @@
 import pandas as pd
 import os
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import Iterable, List, Optional, Tuple
+
+try:
+    import python_calamine  # noqa: F401  Rust 实现的 xlsx 解析器，读取速度远快于 openpyxl
+    _EXCEL_ENGINE = 'calamine'
+except ImportError:
+    _EXCEL_ENGINE = None  # 未安装时回退到 pandas 默认引擎
+
+try:
+    import xlsxwriter  # noqa: F401  写 xlsx 比 openpyxl 快且更省内存
+    _EXCEL_WRITER_ENGINE = 'xlsxwriter'
+except ImportError:
+    _EXCEL_WRITER_ENGINE = None  # 未安装时回退到 pandas 默认引擎 (openpyxl)
+
+OUTPUT_FORMATS = ('xlsx', 'csv', 'parquet')
+
+try:
+    import pyarrow  # noqa: F401
+    # Arrow 字符串列：内存占用远小于 object 列，.str.* 操作由 Arrow 的 C++ 内核完成
+    _STRING_DTYPE = 'string[pyarrow]'
+except ImportError:
+    _STRING_DTYPE = 'string'
+
+@lru_cache(maxsize=8)
+def _read_excel_cached(path: str, mtime: float, usecols: Optional[Tuple[str, ...]]) -> pd.DataFrame:
+    """按 (路径, 修改时间, 列) 缓存解析结果；文件被修改后 mtime 变化，缓存自动失效。"""
+    # 用函数形式的 usecols：文件中不存在的列会被忽略而不是报错，缺列由调用方统一检查并提示
+    return pd.read_excel(
+        path,
+        engine=_EXCEL_ENGINE,
+        usecols=None if usecols is None else (lambda col: col in usecols)
+    )
+
+def read_excel_cached(path: str, usecols: Optional[Iterable[str]] = None) -> pd.DataFrame:
+    """
+    读取Excel文件。在同一进程中重复读取未修改过的文件（如在 notebook 中多次运行）时直接复用已解析的结果。
+    usecols 不为 None 时只解析这些列。
+    返回副本，调用方可以随意修改而不会污染缓存。
+    """
+    key = None if usecols is None else tuple(dict.fromkeys(usecols))
+    return _read_excel_cached(path, os.path.getmtime(path), key).copy()
+
+def save_dataframe(df: pd.DataFrame, output_file: str, output_format: str = 'xlsx') -> str:
+    """
+    按 output_format 保存 df，返回实际写入的文件路径（扩展名随格式调整）。
+    xlsx 优先使用 xlsxwriter；csv / parquet 供不需要 Excel 的下游使用（parquet 需要 pyarrow）。
+    """
+    if output_format not in OUTPUT_FORMATS:
+        raise ValueError(f"不支持的输出格式: {output_format}，可选: {OUTPUT_FORMATS}")
+
+    output_file = f"{os.path.splitext(output_file)[0]}.{output_format}"
+    if output_format == 'parquet':
+        df.to_parquet(output_file, index=False)
+    elif output_format == 'csv':
+        df.to_csv(output_file, index=False, encoding='utf-8-sig')
+    else:
+        df.to_excel(output_file, index=False, engine=_EXCEL_WRITER_ENGINE)
+    return output_file
 
 def normalize_id_series(series: pd.Series) -> pd.Series:
     """
     将ID列标准化为字符串，去除 '.0' 后缀。
     这能确保 '123' 和 '123.0' 可以互相匹配。
+
+    '.0' 后缀只会在整数ID因缺失值被提升为浮点列时出现，所以：
+    - 浮点列且全部为整数值：走可空整数 Int64 再转字符串，不需要正则；
+    - 整数列：直接转字符串；
+    - 其它（object 等混合类型）：仍用正则兜底。
     """
-    return series.astype(str).str.replace(r'\.0$', '', regex=True)
+    if pd.api.types.is_float_dtype(series):
+        non_null = series.dropna()
+        if (non_null == non_null.round()).all():
+            return series.astype('Int64').astype(_STRING_DTYPE)
+    elif pd.api.types.is_integer_dtype(series):
+        return series.astype(_STRING_DTYPE)
+    return series.astype(str).str.replace(r'\.0$', '', regex=True).astype(_STRING_DTYPE)
 
 def update_aliases_simplified(
     main_file: str = '主表.xlsx',
     alias_source_file: str = 'bgm_archive_20250525 (1).xlsx',
-    output_file_suffix: str = '_updated'
+    output_file_suffix: Optional[str] = '_updated',
+    output_format: str = 'xlsx',
+    keep_columns: Optional[List[str]] = None
 ):
     """
     一个更简洁、直接的别名更新脚本。
@@ -19,28 +92,44 @@ def update_aliases_simplified(
     2. 将两个文件的ID列统一为字符串类型，以确保准确匹配。
     3. 从主表中移除所有旧的'别名'列。
     4. 将别名来源文件中的'id'和'别名'列合并到主表。
-    5. 保存为新文件。
+    5. 保存为新文件（格式由 output_format 指定：xlsx / csv / parquet）。
+
+    别名源文件只解析ID列和别名列；若下游只需要主表的部分列，
+    可通过 keep_columns 指定（ID列总会保留），其余列不会被读入。
+
+    output_file_suffix 为 None 时跳过第5步，直接返回更新后的 DataFrame；
+    否则保存结果并返回实际写入的路径。
     """
     print("--- 开始执行简化版别名更新流程 ---")
 
-    try:
-        main_df = pd.read_excel(main_file)
-        print(f"成功读取主表: {main_file}")
-        alias_df = pd.read_excel(alias_source_file)
-        print(f"成功读取别名源文件: {alias_source_file}")
-    except FileNotFoundError as e:
-        print(f"错误: 文件未找到 - {e}")
-        return
-
     # 定义ID列和别名列
     main_id_col = 'bgmid'
     alias_id_col = 'id'
     alias_col_name = '别名'
 
+    main_usecols = None if keep_columns is None else [main_id_col, *keep_columns]
+    # 两个文件互不依赖，放到两个线程中同时解析（解压与 XML/二进制解析期间会释放 GIL）
+    try:
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            main_future = executor.submit(read_excel_cached, main_file, main_usecols)
+            alias_future = executor.submit(read_excel_cached, alias_source_file, [alias_id_col, alias_col_name])
+            main_df = main_future.result()
+            print(f"成功读取主表: {main_file}")
+            alias_df = alias_future.result()
+            print(f"成功读取别名源文件: {alias_source_file}")
+    except FileNotFoundError as e:
+        print(f"错误: 文件未找到 - {e}")
+        return
+
     # 检查必要的列是否存在
     if main_id_col not in main_df.columns:
         print(f"错误: 主表 '{main_file}' 中缺少 '{main_id_col}' 列。")
         return
+    if main_usecols is not None:
+        missing_cols = [col for col in main_usecols if col not in main_df.columns]
+        if missing_cols:
+            print(f"错误: 主表 '{main_file}' 中缺少 keep_columns 指定的列: {missing_cols}")
+            return
     if alias_id_col not in alias_df.columns:
         print(f"错误: 别名源文件 '{alias_source_file}' 中缺少 '{alias_id_col}' 列。")
         return
@@ -55,33 +144,30 @@ def update_aliases_simplified(
     main_df[main_id_col] = normalize_id_series(main_df[main_id_col])
     alias_df[alias_id_col] = normalize_id_series(alias_df[alias_id_col])
 
-    # 2. 从主表中删除所有以'别名'开头的列
-    existing_alias_cols = [col for col in main_df.columns if str(col).startswith('别名')]
-    if existing_alias_cols:
-        print(f"正在从主表移除旧的别名列: {existing_alias_cols}")
-        main_df = main_df.drop(columns=existing_alias_cols)
+    # 2. 找出主表中所有以'别名'开头的旧列（在第4步写入新别名时一并删除）
+    existing_alias_cols = main_df.filter(regex=r'^别名').columns
+    if len(existing_alias_cols):
+        print(f"正在从主表移除旧的别名列: {existing_alias_cols.tolist()}")
 
     # 3. 准备要合并的别名数据，只保留ID和别名列
-    alias_to_merge = alias_df[[alias_id_col, alias_col_name]].copy()
-    alias_to_merge.dropna(subset=[alias_col_name], inplace=True)
+    alias_to_merge = alias_df[[alias_id_col, alias_col_name]].dropna(subset=[alias_col_name])
+    alias_to_merge[alias_col_name] = alias_to_merge[alias_col_name].astype(_STRING_DTYPE)
     
-    # 4. 使用 left merge 将别名合并到主表
+    # 4. 按ID查表，把别名映射到主表
+    # 只需要带过来一列，用 Series.map 做一对一查找，比 merge 少了哈希连接和索引对齐的开销，
+    # 也不会产生多余的ID列。
     print(f"开始根据 '{main_id_col}' (主表) 和 '{alias_id_col}' (源文件) 进行合并...")
-    updated_df = pd.merge(
-        main_df,
-        alias_to_merge,
-        left_on=main_id_col,
-        right_on=alias_id_col,
-        how='left'
-    )
-    
-    # 合并后，源文件的列名会 그대로 가져옴. 我们将它重命名为 '别名'
-    if alias_col_name in updated_df.columns:
-        updated_df.rename(columns={alias_col_name: '别名'}, inplace=True)
-    
-    # 删除多余的ID列
-    if alias_id_col != main_id_col and alias_id_col in updated_df.columns:
-        updated_df = updated_df.drop(columns=[alias_id_col])
+    # 源文件中的ID应当唯一（m:1）；若有重复则只保留第一条，并提示出来，而不是悄悄丢弃
+    duplicated_ids = alias_to_merge[alias_id_col].duplicated(keep='first')
+    if duplicated_ids.any():
+        print(f"警告：别名源文件中有 {duplicated_ids.sum()} 行的 '{alias_id_col}' 重复，将只使用每个ID的第一条别名。")
+    lookup = alias_to_merge.loc[~duplicated_ids].set_index(alias_id_col)[alias_col_name]
+    # 主表中同一个ID可能出现多次：先因子化为整数编码，只对去重后的ID查一次表，
+    # 再按编码展开回每一行，避免对每行的字符串ID重复做哈希查找
+    codes, uniques = pd.factorize(main_df[main_id_col], use_na_sentinel=False)
+    alias_values = lookup.reindex(uniques).array.take(codes)
+    # 删除旧别名列和写入新别名列在同一条链式调用中完成，不产生额外的中间表
+    updated_df = main_df.drop(columns=existing_alias_cols).assign(别名=alias_values)
 
     # --- 检查合并结果 ---
     # 检查 '别名' 列是否存在
@@ -95,16 +181,22 @@ def update_aliases_simplified(
         print("错误：合并后 '别名' 列不存在。")
 
     # 5. 保存结果
+    if output_file_suffix is None:
+        print("--- 流程结束 (未保存文件，直接返回结果) ---")
+        return updated_df
+
     base, ext = os.path.splitext(main_file)
     output_file = f"{base}{output_file_suffix}{ext}"
     
     try:
-        updated_df.to_excel(output_file, index=False)
+        output_file = save_dataframe(updated_df, output_file, output_format)
         print(f"保存成功！🎉 文件已保存至: {output_file}")
     except Exception as e:
         print(f"保存文件时出错: {e}")
+        output_file = None
 
     print("--- 流程结束 ---")
+    return output_file
 
 
 if __name__ == "__main__":
@@ -1,27 +1,181 @@
 import os
+import csv
 import time
 import json
+import logging
+import queue
+import sqlite3
+import threading
+import unicodedata
+import zipfile
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from difflib import SequenceMatcher
-from typing import List, Dict, Any, Optional
+from typing import Callable, List, Dict, Any, Optional, Tuple
 
 import pandas as pd
 import requests
-from openpyxl import load_workbook
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from openpyxl import Workbook, load_workbook
 from tqdm import tqdm
 
+try:
+    # C 实现的编辑距离相似度，替代 difflib.SequenceMatcher 逐对比较
+    from Levenshtein import ratio as levenshtein_ratio
+except ImportError:
+    levenshtein_ratio = None  # 未安装时回退到 difflib
+
+try:
+    # 本地磁盘缓存：重跑/断点续跑时相同的搜索与会社查询直接读缓存，不再请求接口
+    from diskcache import Cache
+except ImportError:
+    Cache = None  # 未安装时不缓存，每次都请求接口
+
+try:
+    # Rust 实现的 JSON 解析，比标准库 json 快数倍
+    import orjson
+except ImportError:
+    orjson = None  # 未安装时回退到标准库 json
+
 
 ###############################################################################
 # 工具函数
 ###############################################################################
 
-def get_access_token() -> Optional[str]:
+# 所有接口请求共用一个 Session：复用 TCP/TLS 连接 (keep-alive)，不必每次请求都重新握手；
+# 网关偶发的 502/503/504 由连接池按指数退避自动重试
+SESSION = requests.Session()
+SESSION.mount("https://", HTTPAdapter(
+    pool_connections=4,
+    pool_maxsize=16,
+    # raise_on_status=False：重试用尽后仍返回最后一次的响应 (而不是抛出 RetryError)，由调用方按状态码处理
+    max_retries=Retry(total=3, backoff_factor=0.3, status_forcelist=[502, 503, 504], raise_on_status=False)
+))
+SESSION.headers.update({"Accept": "application/json", "version": "1"})
+
+# 日志级别由环境变量 YMGAL_LOG 控制 (默认 WARNING)；设为 DEBUG 时输出逐行的匹配过程。
+# 逐行信息不再直接 print：既省去每行一次的控制台 I/O，也不会打乱 tqdm 进度条
+logging.basicConfig(level=os.getenv("YMGAL_LOG", "WARNING"))
+log = logging.getLogger("ymgal")
+
+
+class LazyStr:
+    """延迟生成的日志参数：只有日志真正输出时才调用 ``func`` (如序列化整个 API 响应)。"""
+
+    def __init__(self, func: Callable[[], str]) -> None:
+        self.func = func
+
+    def __str__(self) -> str:
+        return self.func()
+
+
+def json_dumps_pretty(obj: Any) -> str:
+    """缩进格式化，仅用于调试日志 (配合 ``LazyStr``)。"""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2).decode()
+    return json.dumps(obj, indent=2, ensure_ascii=False)
+
+
+def json_loads(data: bytes) -> Any:
+    """解析响应体 (``response.content``)，优先使用 orjson。"""
+    return orjson.loads(data) if orjson is not None else json.loads(data)
+
+
+# 搜索请求的并发线程数 (接口调用是 I/O 密集型，线程等待网络时会释放 GIL)
+MAX_WORKERS = 8
+# 相邻两次接口请求的最小间隔 (秒)，所有线程共享，避免触发接口限流
+REQUEST_INTERVAL = 0.001
+
+
+class RateLimiter:
+    """多线程共享的限速器：保证任意两次 ``wait`` 返回的时间间隔不小于 ``min_interval``。"""
+
+    def __init__(self, min_interval: float) -> None:
+        self.min_interval = min_interval
+        self._lock = threading.Lock()
+        self._next_time = 0.0
+
+    def wait(self) -> None:
+        with self._lock:
+            now = time.monotonic()
+            delay = self._next_time - now
+            self._next_time = max(now, self._next_time) + self.min_interval
+        if delay > 0:
+            time.sleep(delay)
+
+
+RATE_LIMITER = RateLimiter(REQUEST_INTERVAL)
+# 多个线程同时遇到 401 时只让其中一个去刷新 token
+TOKEN_REFRESH_LOCK = threading.Lock()
+# token 距过期不足该秒数时提前刷新
+TOKEN_REFRESH_MARGIN = 300
+
+# 接口响应两级缓存，只缓存成功 (HTTP 200) 的结果：
+# 一级为进程内 LRU (同一次运行中重复的关键词/会社不再请求)，二级为 diskcache 磁盘缓存 (跨运行复用)
+MEMORY_CACHE_SIZE = 4096
+CACHE_DIR = ".ymgal_cache"
+CACHE_EXPIRE = 24 * 3600
+CACHE = Cache(CACHE_DIR) if Cache is not None else None
+
+
+class MemoryCache:
+    """线程安全的进程内 LRU 缓存，条目数超过 ``maxsize`` 时淘汰最久未使用的条目。"""
+
+    def __init__(self, maxsize: int) -> None:
+        self.maxsize = maxsize
+        self._data: "OrderedDict[tuple, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: tuple) -> Any:
+        with self._lock:
+            value = self._data.get(key)
+            if value is not None:
+                self._data.move_to_end(key)
+            return value
+
+    def set(self, key: tuple, value: Any) -> None:
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            if len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+
+MEMORY_CACHE = MemoryCache(MEMORY_CACHE_SIZE)
+
+
+def cache_get(key: tuple) -> Any:
+    """依次读取内存缓存和磁盘缓存，都未命中时返回 ``None``；磁盘命中的结果会放入内存缓存。"""
+    value = MEMORY_CACHE.get(key)
+    if value is None and CACHE is not None:
+        value = CACHE.get(key)
+        if value is not None:
+            MEMORY_CACHE.set(key, value)
+    return value
+
+
+def cache_set(key: tuple, value: Any) -> None:
+    MEMORY_CACHE.set(key, value)
+    if CACHE is not None:
+        CACHE.set(key, value, expire=CACHE_EXPIRE)
+
+
+def normalize_keyword(keyword: str) -> str:
+    """缓存用的关键词规范化：NFKC 合并全角/半角写法，并去除首尾空白、统一小写。"""
+    return unicodedata.normalize("NFKC", keyword).strip().lower()
+
+
+def request_access_token() -> Optional[Tuple[str, float]]:
     """
-    调用 OAuth2 *Client Credentials* 模式获取 **access_token**，有效期 1 小时。
+    调用 OAuth2 *Client Credentials* 模式获取 **access_token** 及其过期时间。
 
     Returns
     -------
-    str | None
-        成功时返回 token 字符串；失败时打印错误并返回 ``None``。
+    tuple[str, float] | None
+        成功时返回 ``(token, expires_at)``，``expires_at`` 为 ``time.time()`` 时间戳
+        (按接口返回的 ``expires_in`` 计算，缺失时按 1 小时)；失败 (含网络异常、响应体无法解析) 时
+        打印错误并返回 ``None``，调用方据此决定继续使用旧 token 或退出。
     """
     url = "https://www.ymgal.games/oauth/token"
     data = {
@@ -30,21 +184,82 @@ def get_access_token() -> Optional[str]:
         "client_secret": "luna0327",  # 固定 client_secret，由月幕平台提供
         "scope": "public"  # 只申请公开数据权限
     }
-    response = requests.post(url, data=data)
+    try:
+        response = SESSION.post(url, data=data, timeout=10)
+        body = json_loads(response.content) if response.status_code == 200 else None
+    except (requests.RequestException, ValueError) as exc:
+        log.error("获取 token 失败: %s", exc)
+        return None
 
-    if response.status_code == 200:
-        return response.json().get("access_token")
+    if isinstance(body, dict):
+        token = body.get("access_token")
+        if token:
+            try:
+                expires_in = float(body.get("expires_in", 3600))
+            except (ValueError, TypeError):
+                expires_in = 3600.0
+            return token, time.time() + expires_in
 
     # 失败时输出详细信息，方便排查
-    print("获取 token 失败:", response.status_code, response.text)
+    log.error("获取 token 失败: %s %s", response.status_code, response.text)
     return None
 
 
+def get_access_token() -> Optional[str]:
+    """
+    调用 OAuth2 *Client Credentials* 模式获取 **access_token**，有效期 1 小时。
+
+    Returns
+    -------
+    str | None
+        成功时返回 token 字符串；失败时打印错误并返回 ``None``。
+    """
+    fetched = request_access_token()
+    return fetched[0] if fetched else None
+
+
+def _store_new_token(token_ref: Dict[str, Any]) -> bool:
+    """获取新 token 写入 ``token_ref``；调用方需持有 ``TOKEN_REFRESH_LOCK``。"""
+    fetched = request_access_token()
+    if fetched is None:
+        return False
+    token_ref["value"], token_ref["expires_at"] = fetched
+    return True
+
+
+def refresh_token(token_ref: Dict[str, Any], stale_token: str) -> bool:
+    """
+    ``stale_token`` 失效后刷新 ``token_ref``，成功 (或已被其它线程刷新) 时返回 ``True``。
+
+    在锁内比较：若 ``token_ref`` 中已不是 ``stale_token``，说明别的线程刚刷新过，直接沿用。
+    """
+    with TOKEN_REFRESH_LOCK:
+        if token_ref["value"] != stale_token:
+            return True
+        return _store_new_token(token_ref)
+
+
+def ensure_token_valid(token_ref: Dict[str, Any]) -> None:
+    """
+    请求前调用：token 距过期不足 ``TOKEN_REFRESH_MARGIN`` 秒时提前刷新，
+    避免先收到一次 401 再刷新重试。没有 ``expires_at`` 的 ``token_ref`` 不做处理，仍由 401 兜底。
+    """
+    expires_at = token_ref.get("expires_at")
+    if expires_at is None or time.time() < expires_at - TOKEN_REFRESH_MARGIN:
+        return
+    with TOKEN_REFRESH_LOCK:
+        # 等锁期间可能已被其它线程刷新
+        if time.time() < token_ref["expires_at"] - TOKEN_REFRESH_MARGIN:
+            return
+        if not _store_new_token(token_ref):
+            log.warning("提前刷新 token 失败，继续使用当前 token")
+
+
 # ---------------------------------------------------------------------------
 # 搜索相关辅助
 # ---------------------------------------------------------------------------
 
-def parse_search_response(response: requests.Response) -> List[Dict[str, Any]]:
+def parse_search_response(response: requests.Response) -> Optional[List[Dict[str, Any]]]:
     """
     解析 *search-game* 接口返回，提取游戏及其会社信息。
 
@@ -55,8 +270,8 @@ def parse_search_response(response: requests.Response) -> List[Dict[str, Any]]:
 
     Returns
     -------
-    list[dict]
-        解析后的结果列表，每个元素均包含：
+    list[dict] | None
+        解析后的结果列表 (响应体无法解析时返回 ``None``，以便调用方不缓存这次结果)，每个元素均包含：
         - ``name``：日文 / 英文原名
         - ``chineseName``：中文名(可能为空)
         - ``ym_id``：月幕游戏 ID
@@ -64,15 +279,16 @@ def parse_search_response(response: requests.Response) -> List[Dict[str, Any]]:
         - ``orgId`` / ``orgName`` / ``orgWebsite`` / ``orgDescription``：会社信息
     """
     try:
-        response_data = response.json()
-        # # --- 调试输出，可根据需要关闭 ------------------------------------
-        # print("\n完整 API 响应：")
-        # print(json.dumps(response_data, indent=2, ensure_ascii=False))
-        # # ------------------------------------------------------------------
+        response_data = json_loads(response.content)
         results = response_data.get("data", {}).get("result", [])
+        # 完整响应只在 DEBUG 级别开启时才序列化
+        log.debug(
+            "search-game result count=%d, response: %s",
+            len(results), LazyStr(lambda: json_dumps_pretty(response_data))
+        )
     except Exception as exc:
-        print("解析 response 失败：", exc)
-        return []
+        log.warning("解析 response 失败：%s", exc)
+        return None
 
     parsed: List[Dict[str, Any]] = []
     for item in results:
@@ -109,7 +325,7 @@ def parse_search_response(response: requests.Response) -> List[Dict[str, Any]]:
 
 def search_ym_top_matches(
         keyword: str,
-        token_ref: Dict[str, str],
+        token_ref: Dict[str, Any],
         top_k: int = 3,
         threshold: float = 0.8
 ) -> List[Dict[str, Any]]:
@@ -118,7 +334,10 @@ def search_ym_top_matches(
 
     特性：
     --------
-    - **Token 自动刷新**：若接口返回 401 则重新获取一次 token，最多重试 4 次。
+    - **Token 自动刷新**：临近过期时提前刷新；若接口仍返回 401 则重新获取一次 token，最多重试 4 次。
+    - **线程安全**：可在多个线程中同时调用，token 刷新与请求限速在线程间共享。
+    - **两级缓存**：成功的搜索结果按规范化后的关键词 (``normalize_keyword``) 缓存在内存中，
+      安装了 ``diskcache`` 时同时写入磁盘缓存 ``CACHE_EXPIRE`` 秒。
     - **阈值过滤**：若最高得分 >= ``threshold`` 则只返回 1 条最优匹配。
 
     参数
@@ -126,7 +345,8 @@ def search_ym_top_matches(
     keyword : str
         待搜索的 Bangumi 游戏名称。
     token_ref : dict
-        形如 ``{"value": <token>}`` 的可变字典，用于在内部更新失效 token。
+        形如 ``{"value": <token>, "expires_at": <过期时间戳>}`` 的可变字典，用于在内部更新失效 token；
+        ``expires_at`` 可省略，此时只在收到 401 后刷新。
     top_k : int, default=3
         未触发阈值过滤时，返回结果数。
     threshold : float, default=0.8
@@ -148,45 +368,53 @@ def search_ym_top_matches(
             "pageSize": 20,
             "includeOrg": "true"
         }
-        headers = {
-            "Authorization": f"Bearer {token}",
-            "Accept": "application/json",
-            "version": "1"
-        }
-        return requests.get(url, params=params, headers=headers, timeout=10)
-
-    # --- 主流程：最多尝试 4 次 --------------------------------------------
-    for attempt in range(4):
+        headers = {"Authorization": f"Bearer {token}"}  # Accept / version 已设为 SESSION 默认请求头
+        RATE_LIMITER.wait()
+        return SESSION.get(url, params=params, headers=headers, timeout=10)
+
+    # --- 先查缓存；未命中时请求接口，最多尝试 4 次 -----------------------
+    cache_key = ("search", normalize_keyword(keyword))
+    matches = cache_get(cache_key)
+    for attempt in range(4 if matches is None else 0):
+        ensure_token_valid(token_ref)
         token = token_ref["value"]
-        response = _make_request(token)
+        try:
+            response = _make_request(token)
+        except requests.RequestException as exc:
+            # 超时 / 连接失败：只放弃这一个关键词，不让异常中断整个匹配流程
+            log.warning("搜索请求失败: %s", exc)
+            return []
 
-        # 1. 请求成功 -> 解析
+        # 1. 请求成功 -> 解析并缓存 (缓存排序后的全部结果，阈值过滤在返回前进行)
         if response.status_code == 200:
             matches = parse_search_response(response)
+            if matches is None:  # 响应体损坏：本次视为失败，不写入缓存
+                return []
             matches = sorted(matches, key=lambda x: x["score"], reverse=True)
-
-            # 阈值过滤逻辑
-            if matches and matches[0]["score"] >= threshold:
-                return matches[:1]
-            return matches[:top_k]
+            cache_set(cache_key, matches)
+            break
 
         # 2. Token 失效 -> 刷新后重试
         elif response.status_code == 401:
-            print("Token 失效，正在重新获取…")
-            new_token = get_access_token()
-            if new_token:
-                token_ref["value"] = new_token
+            log.info("Token 失效，正在重新获取…")
+            if refresh_token(token_ref, token):
                 continue
-            print("重新获取 token 失败")
+            log.error("重新获取 token 失败")
             return []
 
         # 3. 其它错误 -> 直接返回空
         else:
-            print(f"搜索失败: {response.status_code}, {response.text}")
+            log.warning("搜索失败: %s, %s", response.status_code, response.text)
             return []
 
     # 超出重试次数
-    return []
+    if matches is None:
+        return []
+
+    # 阈值过滤逻辑
+    if matches and matches[0]["score"] >= threshold:
+        return matches[:1]
+    return matches[:top_k]
 
 
 ###############################################################################
@@ -203,74 +431,249 @@ EXCEL_COLUMNS_MATCHED = [
     "匹配来源"
 ]
 
+UNMATCHED_COLUMN = "原始的未匹配bgm游戏名称"
+
 EXCEL_COLUMNS_ORG = [
     "org_id", "name", "chineseName", "website", "description", "birthday"
 ]
 
+# 结果文件格式：xlsx 便于人工查看；csv 追加写入时无需解析/重写已有内容，大批量跑时快得多
+OUTPUT_FORMATS = ("xlsx", "csv")
+
+
+def output_path(output_file: str, output_format: str) -> str:
+    """按 ``output_format`` 调整文件扩展名 (``ymgames_matched.xlsx`` -> ``ymgames_matched.csv``)。"""
+    if output_format not in OUTPUT_FORMATS:
+        raise ValueError(f"不支持的输出格式: {output_format}，可选: {OUTPUT_FORMATS}")
+    return f"{os.path.splitext(output_file)[0]}.{output_format}"
+
+
+def is_csv(output_file: str) -> bool:
+    return output_file.lower().endswith(".csv")
+
+
+def read_table(path: str, usecols: Optional[List[str]] = None, dtype: Any = None, **kwargs: Any) -> pd.DataFrame:
+    """
+    按扩展名读取 csv / xlsx 结果文件。
+    ``usecols`` 不为 ``None`` 时只解析这些列，文件中不存在的列会被忽略 (由调用方检查)；
+    其余关键字参数 (如 ``keep_default_na``) 原样传给 ``pd.read_csv`` / ``pd.read_excel``。
+    """
+    columns = None if usecols is None else (lambda col: col in usecols)
+    if is_csv(path):
+        return pd.read_csv(path, encoding="utf-8-sig", usecols=columns, dtype=dtype, **kwargs)
+    return pd.read_excel(path, engine="openpyxl", usecols=columns, dtype=dtype, **kwargs)
+
+
+def write_frame(df: pd.DataFrame, output_file: str) -> None:
+    """按 ``output_file`` 的格式整表写出 (用于初始化与兜底备份)。"""
+    if is_csv(output_file):
+        df.to_csv(output_file, index=False, encoding="utf-8-sig")
+    else:
+        df.to_excel(output_file, index=False)
+
+
+def _write_csv_header(output_file: str, columns: List[str]) -> None:
+    with open(output_file, "w", newline="", encoding="utf-8-sig") as fh:
+        csv.writer(fh).writerow(columns)
+
+
+def _xlsx_valid(path: str) -> bool:
+    """轻量的完整性检查：xlsx 是 zip 包，只确认能打开且包含 ``xl/workbook.xml``，不解析任何工作表。"""
+    try:
+        with zipfile.ZipFile(path) as zf:
+            return "xl/workbook.xml" in zf.namelist()
+    except (zipfile.BadZipFile, OSError):
+        return False
+
 
 def init_excel(output_file: str) -> None:
     """
     确保匹配结果文件存在；若不存在或损坏则创建带表头的新文件。
+    ``output_file`` 为 ``.csv`` 时只写一行表头。
     """
     need_create = False
     if not os.path.exists(output_file):
         need_create = True
+    elif is_csv(output_file):
+        need_create = os.path.getsize(output_file) == 0
     else:
-        try:
-            load_workbook(output_file)
-        except Exception:
-            need_create = True
+        need_create = not _xlsx_valid(output_file)
 
     if need_create:
-        pd.DataFrame(columns=EXCEL_COLUMNS_MATCHED).to_excel(output_file, index=False)
-        print(f"已初始化输出文件：{output_file}")
+        if is_csv(output_file):
+            _write_csv_header(output_file, EXCEL_COLUMNS_MATCHED)
+        else:
+            pd.DataFrame(columns=EXCEL_COLUMNS_MATCHED).to_excel(output_file, index=False)
+        log.info("已初始化输出文件：%s", output_file)
 
 
 def init_org_excel(output_file: str) -> None:
     """类似 ``init_excel``，但针对会社信息文件。"""
     if not os.path.exists(output_file):
-        pd.DataFrame(columns=EXCEL_COLUMNS_ORG).to_excel(output_file, index=False)
-        print(f"已初始化会社信息文件：{output_file}")
+        if is_csv(output_file):
+            _write_csv_header(output_file, EXCEL_COLUMNS_ORG)
+        else:
+            pd.DataFrame(columns=EXCEL_COLUMNS_ORG).to_excel(output_file, index=False)
+        log.info("已初始化会社信息文件：%s", output_file)
 
 
-def append_to_excel(row_data: List[Dict[str, Any]], output_file: str) -> None:
+# 缓冲写入：匹配过程中先把行攒在内存里，每 ``FLUSH_EVERY`` 行才追加写入一次。
+# csv 直接追加到文件末尾；xlsx 无法原地追加，整个运行期间只打开一次工作簿 (不再每次写入都读回整个工作簿)，
+# 行在内存中追加，每累计 ``XLSX_SAVE_EVERY`` 行保存一次，进程被强制结束时最多丢失这么多行；
+# 结束时由 ``save_workbooks`` 保存剩余的行。
+FLUSH_EVERY = 200
+XLSX_SAVE_EVERY = FLUSH_EVERY * 5
+
+
+def _cell_value(value: Any) -> Any:
+    """将 NaN / NA 转为空单元格，其余值原样写入。"""
+    if value is None or (pd.api.types.is_scalar(value) and pd.isna(value)):
+        return None
+    return value
+
+
+# 本次运行中已打开的工作簿：路径 -> (工作簿, 表头)，以及各工作簿上次保存后新追加的行数
+_OPEN_WORKBOOKS: Dict[str, Tuple[Workbook, List[str]]] = {}
+_UNSAVED_ROWS: Dict[str, int] = {}
+
+
+def _open_workbook(output_file: str) -> Tuple[Workbook, List[str]]:
+    """返回 ``output_file`` 对应的已打开工作簿及其表头；第一次使用时才从磁盘读取 (不存在时新建)。"""
+    if output_file not in _OPEN_WORKBOOKS:
+        if os.path.exists(output_file):
+            wb = load_workbook(output_file)
+            ws = wb.active
+            header = [cell.value for cell in ws[1]] if ws.max_row >= 1 else []
+            header = [h for h in header if h is not None]
+        else:
+            wb = Workbook()
+            header = []
+        _OPEN_WORKBOOKS[output_file] = (wb, header)
+    return _OPEN_WORKBOOKS[output_file]
+
+
+def _save_workbook(output_file: str, wb: Workbook) -> None:
+    """保存工作簿；原文件被占用时另存为临时文件，其它错误时另存为备份文件。"""
+    _UNSAVED_ROWS[output_file] = 0
+    try:
+        try:
+            wb.save(output_file)
+        except PermissionError:  # 常见于文件被 Excel 占用
+            temp_file = f"{output_file}.temp"
+            wb.save(temp_file)
+            log.warning("原文件被占用，数据已保存到临时文件：%s", temp_file)
+    except Exception as exc:
+        log.error("保存数据时发生错误: %s", exc)
+        backup_file = f"{output_file}.backup"
+        wb.save(backup_file)
+        log.warning("数据已保存到备用文件：%s", backup_file)
+
+
+def save_workbooks() -> None:
+    """保存并关闭本次运行中通过 ``flush_pending`` 追加过的全部 xlsx 工作簿。"""
+    while _OPEN_WORKBOOKS:
+        output_file, (wb, _) = _OPEN_WORKBOOKS.popitem()
+        _save_workbook(output_file, wb)
+        _UNSAVED_ROWS.pop(output_file, None)
+
+
+def _append_rows_xlsx(pending_rows: List[Dict[str, Any]], output_file: str) -> None:
     """
-    将 ``row_data`` 追加写入到 ``output_file``，支持自动创建及占用兜底。
+    通过 ``openpyxl`` 在 (已打开的) 工作表末尾 ``append``，不经 pandas 解析/重建整张表。
+    每累计 ``XLSX_SAVE_EVERY`` 行保存一次，剩余的行由 ``save_workbooks`` 保存。
     """
-    try:
-        df_new = pd.DataFrame(row_data)
+    wb, header = _open_workbook(output_file)
+    ws = wb.active
+
+    # 1️⃣ 补全表头
+    for row in pending_rows:
+        for key in row:
+            if key not in header:
+                header.append(key)
+                ws.cell(row=1, column=len(header), value=key)
+
+    # 2️⃣ 按表头顺序逐行追加
+    for row in pending_rows:
+        ws.append([_cell_value(row.get(col)) for col in header])
+
+    _UNSAVED_ROWS[output_file] = _UNSAVED_ROWS.get(output_file, 0) + len(pending_rows)
+    if _UNSAVED_ROWS[output_file] >= XLSX_SAVE_EVERY:
+        _save_workbook(output_file, wb)
+
+
+def _append_rows_csv(pending_rows: List[Dict[str, Any]], output_file: str) -> None:
+    """以追加模式打开 csv 直接写入新行，已有内容既不读取也不重写。"""
+    header: List[str] = []
+    if os.path.exists(output_file) and os.path.getsize(output_file) > 0:
+        with open(output_file, newline="", encoding="utf-8-sig") as fh:
+            header = next(csv.reader(fh), [])
+
+    new_keys = [key for key in dict.fromkeys(k for row in pending_rows for k in row) if key not in header]
+    if new_keys and header:
+        # 出现新列 (很少见)：只有这时才需要整表重写表头。
+        # 按原样的字符串读入，避免 ID 变成浮点、空单元格变成 "nan"；先写临时文件再替换，中途出错不损坏原文件
+        existing = read_table(output_file, dtype=str, keep_default_na=False)
+        temp_file = f"{output_file}.temp"
+        existing.reindex(columns=header + new_keys).to_csv(temp_file, index=False, encoding="utf-8-sig")
+        os.replace(temp_file, output_file)
+    elif new_keys:
+        _write_csv_header(output_file, new_keys)
+    header += new_keys
+
+    with open(output_file, "a", newline="", encoding="utf-8-sig") as fh:
+        writer = csv.DictWriter(fh, fieldnames=header)
+        writer.writerows({col: _cell_value(row.get(col)) for col in header} for row in pending_rows)
+
+
+def flush_pending(pending_rows: List[Dict[str, Any]], output_file: str) -> None:
+    """
+    将缓冲区 ``pending_rows`` 一次性追加写入 ``output_file``，写完后清空缓冲区。
 
-        # 1️⃣ 文件不存在：直接写
-        if not os.path.exists(output_file):
-            df_new.to_excel(output_file, index=False)
-            return
+    按扩展名追加到 xlsx 或 csv 末尾 (xlsx 追加到内存中的工作簿并定期保存，结束时需调用 ``save_workbooks``)。
+    各列按文件表头的顺序写入；行中出现表头没有的新键时会追加为新列，与原先 ``pd.concat`` 的合并语义一致。
+    文件被占用等情况仍保留临时文件/备份文件兜底。
+    """
+    if not pending_rows:
+        return
 
-        # 2️⃣ 文件存在：读取 + 合并 + 写回
+    try:
         try:
-            df_exist = pd.read_excel(output_file)
-            df_combined = pd.concat([df_exist, df_new], ignore_index=True)
-            df_combined.to_excel(output_file, index=False)
+            if is_csv(output_file):
+                _append_rows_csv(pending_rows, output_file)
+            else:
+                _append_rows_xlsx(pending_rows, output_file)
         except PermissionError:  # 常见于文件被 Excel 占用
             temp_file = f"{output_file}.temp"
-            df_new.to_excel(temp_file, index=False)
-            print(f"原文件被占用，数据已保存到临时文件：{temp_file}")
+            write_frame(pd.DataFrame(pending_rows), temp_file)
+            log.warning("原文件被占用，数据已保存到临时文件：%s", temp_file)
     except Exception as exc:
         # 兜底打印 & 备份
-        print(f"保存数据时发生错误: {exc}")
+        log.error("保存数据时发生错误: %s", exc)
         backup_file = f"{output_file}.backup"
-        pd.DataFrame(row_data).to_excel(backup_file, index=False)
-        print(f"数据已保存到备用文件：{backup_file}")
+        write_frame(pd.DataFrame(pending_rows), backup_file)
+        log.warning("数据已保存到备用文件：%s", backup_file)
+    finally:
+        pending_rows.clear()
+
+
+def flush_if_full(pending_rows: List[Dict[str, Any]], output_file: str) -> None:
+    """缓冲区攒够 ``FLUSH_EVERY`` 行时写入一次。"""
+    if len(pending_rows) >= FLUSH_EVERY:
+        flush_pending(pending_rows, output_file)
+
+
+def append_to_excel(row_data: List[Dict[str, Any]], output_file: str) -> None:
+    """
+    将 ``row_data`` 立即追加写入到 ``output_file``，支持自动创建及占用兜底。
+    批量场景请把行攒进缓冲区后调用 ``flush_pending``。
+    """
+    flush_pending(list(row_data), output_file)
+    save_workbooks()
 
 
 def append_unmatched_to_excel(name: str, unmatched_file: str) -> None:
     """记录未匹配成功的 Bangumi 名称。"""
-    df = pd.DataFrame([[name]], columns=["原始的未匹配bgm游戏名称"])
-    if not os.path.exists(unmatched_file):
-        df.to_excel(unmatched_file, index=False)
-    else:
-        with pd.ExcelWriter(unmatched_file, mode="a", engine="openpyxl", if_sheet_exists="overlay") as writer:
-            sheet = writer.book["Sheet1"]
-            df.to_excel(writer, index=False, header=False, startrow=sheet.max_row)
+    append_to_excel([{UNMATCHED_COLUMN: name}], unmatched_file)
 
 
 def append_org_to_excel(org_info: Dict[str, Any], output_file: str) -> None:
@@ -278,36 +681,101 @@ def append_org_to_excel(org_info: Dict[str, Any], output_file: str) -> None:
     append_to_excel([org_info], output_file)
 
 
+# 匹配结果中的会社列 -> 会社详细信息中的字段
+ORG_PATCH_FIELDS = {"orgName": "name", "orgWebsite": "website", "orgDescription": "description"}
+
+
+def _patch_org_fields_xlsx(output_file: str, org_infos: Dict[str, Dict[str, Any]]) -> None:
+    wb = load_workbook(output_file)
+    ws = wb.active
+    header = [cell.value for cell in ws[1]]
+    if "orgId" not in header:
+        return
+    id_col = header.index("orgId")
+    targets = [(header.index(col), field) for col, field in ORG_PATCH_FIELDS.items() if col in header]
+    for row in ws.iter_rows(min_row=2):
+        info = org_infos.get(str(row[id_col].value))
+        if info:
+            for col, field in targets:
+                if field in info:
+                    row[col].value = _cell_value(info[field])
+    wb.save(output_file)
+
+
+def _patch_org_fields_csv(output_file: str, org_infos: Dict[str, Dict[str, Any]]) -> None:
+    with open(output_file, newline="", encoding="utf-8-sig") as fh:
+        reader = csv.DictReader(fh)
+        header = reader.fieldnames or []
+        rows = list(reader)
+    if "orgId" not in header:
+        return
+    for row in rows:
+        info = org_infos.get(row["orgId"])
+        if info:
+            for col, field in ORG_PATCH_FIELDS.items():
+                if col in header and field in info:
+                    row[col] = _cell_value(info[field])
+    with open(output_file, "w", newline="", encoding="utf-8-sig") as fh:
+        writer = csv.DictWriter(fh, fieldnames=header)
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def patch_org_fields(output_file: str, org_infos: Dict[str, Dict[str, Any]]) -> None:
+    """
+    第二遍：用后台查询到的会社详细信息 (``org_id -> info``) 回填 ``output_file`` 中
+    同一 ``orgId`` 各行的 ``orgName`` / ``orgWebsite`` / ``orgDescription``。
+    匹配时这些行先按搜索结果中的会社字段写入，无需等待会社接口。
+    """
+    if not org_infos or not os.path.exists(output_file):
+        return
+    try:
+        if is_csv(output_file):
+            _patch_org_fields_csv(output_file, org_infos)
+        else:
+            _patch_org_fields_xlsx(output_file, org_infos)
+    except Exception as exc:
+        log.warning("回填会社信息失败: %s", exc)
+
+
 ###############################################################################
 # 会社详细信息查询
 ###############################################################################
 
-def get_organization_details(org_id: str, token: str) -> Optional[Dict[str, Any]]:
+def get_organization_details(org_id: str, token_ref: Dict[str, Any]) -> Optional[Dict[str, Any]]:
     """
     根据 ``org_id`` 向月幕查询会社详细资料。
 
     返回的字段包括：名称、中文名、官网、简介、成立日期等。
     若调用失败或字段缺失，则返回 ``None``。
+    ``token_ref`` 同 ``search_ym_top_matches``：token 失效时刷新一次并重试。
+    查询成功且信息完整的结果同样写入内存及磁盘缓存。
     """
+    cache_key = ("org", org_id)
+    cached = cache_get(cache_key)
+    if cached is not None:
+        return cached
+
     url = "https://www.ymgal.games/open/archive"
     params = {"orgId": org_id}
-    headers = {
-        "Authorization": f"Bearer {token}",
-        "Accept": "application/json",
-        "version": "1"
-    }
 
     try:
-        # ---------- 调试信息 --------------
-        print("\n正在获取会社信息… ID:", org_id)
-        # ---------------------------------
-        response = requests.get(url, params=params, headers=headers, timeout=10)
+        log.debug("正在获取会社信息… ID: %s", org_id)
+        for attempt in range(2):
+            ensure_token_valid(token_ref)
+            token = token_ref["value"]
+            RATE_LIMITER.wait()
+            response = SESSION.get(url, params=params, headers={"Authorization": f"Bearer {token}"}, timeout=10)
+            # 搜索线程并发消耗同一个 token，会社查询时也可能遇到 token 刚好失效
+            if response.status_code != 401 or attempt or not refresh_token(token_ref, token):
+                break
 
         if response.status_code == 200:
-            data = response.json()
+            data = json_loads(response.content)
+            log.debug("archive (org) response: %s", LazyStr(lambda: json_dumps_pretty(data)))
             org_data = data.get("data", {}).get("org", {})
             if not org_data:
-                print("API 响应中未找到会社信息")
+                log.warning("API 响应中未找到会社信息")
                 return None
 
             # 按优先级提取官网地址，fallback 使用第一个
@@ -333,20 +801,137 @@ def get_organization_details(org_id: str, token: str) -> Optional[Dict[str, Any]
                 "description": org_data.get("introduction", ""),
                 "birthday": org_data.get("birthday", "")
             }
+            # 官网/简介缺失的结果不缓存，外层按 retry_count 重试时仍会真正请求接口
+            if result["website"] and result["description"]:
+                cache_set(cache_key, result)
             return result
 
-        if response.status_code == 401:  # token 失效, 交由外层处理
-            print("公司信息获取时 token 失效")
+        if response.status_code == 401:  # 刷新后仍失效
+            log.warning("公司信息获取时 token 失效")
             return None
 
-        print(f"获取会社信息失败: {response.status_code}")
+        log.warning("获取会社信息失败: %s", response.status_code)
         return None
 
     except Exception as exc:
-        print(f"获取会社信息时发生错误: {exc}")
+        log.warning("获取会社信息时发生错误: %s", exc)
         return None
 
 
+ORG_STORE_FIELDS = ("name", "chineseName", "website", "description", "birthday")
+
+
+class OrgStore:
+    """
+    已查询过的会社信息及本次运行中的重试次数，保存在 SQLite 中 (按 ``org_id`` 主键查询)。
+
+    启动时无需再解析整个会社信息文件；库为空时可通过 ``import_frame`` 从已有的会社信息文件导入一次。
+    未取得信息的会社以空字段占位，``get`` 返回的 ``info`` 只包含非空字段。
+    """
+
+    def __init__(self, path: str) -> None:
+        self.conn = sqlite3.connect(path)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS orgs ("
+            "org_id TEXT PRIMARY KEY, name TEXT, chineseName TEXT, website TEXT, "
+            "description TEXT, birthday TEXT, retry_count INTEGER NOT NULL DEFAULT 0)"
+        )
+        # 重试次数只在一次运行内累计：每次启动时信息不完整的会社都可以重新查询
+        self.conn.execute("UPDATE orgs SET retry_count = 0")
+        self.conn.commit()
+
+    def __len__(self) -> int:
+        return self.conn.execute("SELECT COUNT(*) FROM orgs").fetchone()[0]
+
+    def get(self, org_id: str) -> Optional[Dict[str, Any]]:
+        """返回 ``{"info": {...}, "retry_count": n}``，未记录过的会社返回 ``None``。"""
+        row = self.conn.execute(
+            "SELECT name, chineseName, website, description, birthday, retry_count FROM orgs WHERE org_id = ?",
+            (org_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        info = {field: value for field, value in zip(ORG_STORE_FIELDS, row[:-1]) if value is not None}
+        if info:
+            info["id"] = org_id
+        return {"info": info, "retry_count": row[-1]}
+
+    def put(self, org_id: str, info: Dict[str, Any], retry_count: int) -> None:
+        values = [_cell_value(info.get(field)) for field in ORG_STORE_FIELDS]
+        self.conn.execute(
+            "INSERT OR REPLACE INTO orgs VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (org_id, *[None if v is None else str(v) for v in values], retry_count)
+        )
+        self.conn.commit()
+
+    def import_frame(self, org_df: pd.DataFrame) -> None:
+        """从会社信息表导入 (ID 取 ``org_id`` 列，为空时取 ``id`` 列)。"""
+        org_ids = org_df["org_id"] if "org_id" in org_df.columns else pd.Series(None, index=org_df.index)
+        if "id" in org_df.columns:
+            org_ids = org_ids.fillna(org_df["id"])
+        records = org_df.reindex(columns=list(ORG_STORE_FIELDS)).astype(object)
+        records = records.where(records.notna(), None)
+        rows = [
+            (str(org_id), *values, 0)
+            for org_id, values in zip(org_ids, records.itertuples(index=False, name=None))
+            if pd.notna(org_id)
+        ]
+        self.conn.executemany("INSERT OR REPLACE INTO orgs VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+        self.conn.commit()
+
+    def close(self) -> None:
+        self.conn.close()
+
+
+class OrgFetchWorker:
+    """
+    后台查询会社详细信息的线程：主循环只需 ``submit`` 会社 ID 即可继续写入匹配结果，
+    不必在每一行上等待会社接口。
+
+    队列中的 ID 按提交顺序依次查询；同一 ID 可以提交多次 (对应原先信息不完整时的重试)，
+    已取得完整信息 (官网与简介都不为空) 的 ID 不再重复查询。
+    每次成功查询的 ``(org_id, info)`` 放入结果队列，由主线程通过 ``drain`` 取走并保存
+    (SQLite 连接只能在创建它的线程中使用)；``close`` 等待队列查询完毕后返回。
+    """
+
+    def __init__(self, token_ref: Dict[str, Any]) -> None:
+        self.token_ref = token_ref
+        self._known: Dict[str, Dict[str, Any]] = {}
+        self._queue: "queue.Queue[Optional[str]]" = queue.Queue()
+        self._done: "queue.Queue[Tuple[str, Dict[str, Any]]]" = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="org-fetch", daemon=True)
+        self._thread.start()
+
+    def submit(self, org_id: str) -> None:
+        self._queue.put(org_id)
+
+    def _run(self) -> None:
+        while True:
+            org_id = self._queue.get()
+            if org_id is None:
+                return
+            known = self._known.get(org_id)
+            if known and known.get("website") and known.get("description"):
+                continue
+            org_info = get_organization_details(org_id, self.token_ref)
+            if org_info:
+                self._known[org_id] = org_info
+                self._done.put((org_id, org_info))
+
+    def drain(self) -> List[Tuple[str, Dict[str, Any]]]:
+        """取出目前为止已完成、尚未取走的查询结果 (不阻塞)。"""
+        done = []
+        while True:
+            try:
+                done.append(self._done.get_nowait())
+            except queue.Empty:
+                return done
+
+    def close(self) -> None:
+        self._queue.put(None)
+        self._thread.join()
+
+
 ###############################################################################
 # 主流程：Bangumi -> 月幕 首次匹配
 ###############################################################################
@@ -355,73 +940,83 @@ def match_bgm_games_and_save(
         input_file: str = "主表_updated_processed_aliases_20250621_124012.xlsx",
         output_file: str = "ymgames_matched.xlsx",
         unmatched_file: str = "ymgames_unmatched.xlsx",
-        org_output_file: str = "organizations_info.xlsx"
+        org_output_file: str = "organizations_info.xlsx",
+        output_format: str = "xlsx"
 ) -> None:
     """
     读取 Bangumi Excel -> 月幕搜索匹配 -> 写结果
     支持 **断点续跑** ：已处理过的 Bangumi 名称会跳过。
+    ``output_format`` 为 ``"csv"`` 时三个结果文件都改写为 csv (扩展名自动替换)。
     """
+    output_file = output_path(output_file, output_format)
+    unmatched_file = output_path(unmatched_file, output_format)
+    org_output_file = output_path(org_output_file, output_format)
+
     # 1. 读取 Bangumi 源文件
     df_bgm = pd.read_excel(input_file, engine="openpyxl")
-    print(f"DEBUG: 识别到的 Excel 列名：{df_bgm.columns.tolist()}")
+    log.debug("识别到的 Excel 列名：%s", df_bgm.columns.tolist())
 
     # 2. 加载已处理过的 ID (用于断点续跑)
     processed_ids: set[Any] = set()
     if os.path.exists(output_file):
         try:
-            df_exist = pd.read_excel(output_file, engine="openpyxl")
+            # 只需要 ID 列：只解析这一列，并直接按字符串读入，省去整表解析和类型推断
+            df_exist = read_table(output_file, usecols=["bgm_id"], dtype=str)
             if 'bgm_id' in df_exist.columns:
-                processed_ids = set(df_exist["bgm_id"].dropna().astype(str))
+                processed_ids = set(df_exist["bgm_id"].dropna())
             else:
-                print("警告: 输出文件中未找到 'bgm_id' 列，断点续跑可能不准确。")
+                log.warning("输出文件中未找到 'bgm_id' 列，断点续跑可能不准确。")
         except Exception as exc:
-            print("读取已匹配文件失败，将重新创建：", exc)
+            log.warning("读取已匹配文件失败，将重新创建：%s", exc)
 
     # 3. 初始化输出文件 & token
-    token_ref = {"value": get_access_token()}
-    if not token_ref["value"]:
-        print("无法获取 token，流程终止")
+    fetched_token = request_access_token()
+    if fetched_token is None:
+        log.error("无法获取 token，流程终止")
         return
+    token_ref: Dict[str, Any] = {"value": fetched_token[0], "expires_at": fetched_token[1]}
 
     init_excel(output_file)
     init_org_excel(org_output_file)
 
-    # 4. 加载已有会社信息到内存，避免重复查询
-    processed_orgs: Dict[str, Dict[str, Any]] = {}
-    if os.path.exists(org_output_file):
+    # 4. 已查询过的会社信息保存在与会社信息文件同名的 .sqlite 中，避免重复查询；
+    #    第一次运行 (库为空) 时从已有的会社信息文件导入
+    org_store = OrgStore(f"{os.path.splitext(org_output_file)[0]}.sqlite")
+    if not len(org_store) and os.path.exists(org_output_file):
         try:
-            org_df = pd.read_excel(org_output_file, engine="openpyxl")
-            for _, row in org_df.iterrows():
-                org_id = str(row["org_id"])
-                if pd.notna(org_id):
-                    processed_orgs[org_id] = {
-                        "info": row.to_dict(),
-                        "retry_count": 0
-                    }
+            org_store.import_frame(read_table(org_output_file, dtype=str))
         except Exception as exc:
-            print("读取会社信息文件失败，将重新创建：", exc)
-
-    # 5. 遍历 Bangumi 行并匹配
-    for idx, row in tqdm(df_bgm.iterrows(), total=len(df_bgm), desc="处理游戏"):
-        bgm_id = str(row['bgm_id']) if 'bgm_id' in row and pd.notna(row['bgm_id']) else f"ROW_{idx}"
+            log.warning("读取会社信息文件失败，将重新创建：%s", exc)
+
+    # 5. 收集待匹配的行 (跳过已处理的 ID)
+    # 用到的列先整列转换好 (行本身转为 dict 列表)，避免 iterrows 为每一行构造一个 Series
+    bgm_ids = [f"ROW_{idx}" for idx in df_bgm.index]
+    if "bgm_id" in df_bgm.columns:
+        id_str = df_bgm["bgm_id"].astype(str).tolist()
+        bgm_ids = [id_str[i] if has_id else bgm_ids[i] for i, has_id in enumerate(df_bgm["bgm_id"].notna())]
+
+    # 只用别名列进行匹配
+    alias_cols = [col for col in df_bgm.columns if col.startswith("别名")]
+    alias_values = df_bgm[alias_cols].astype(object).where(df_bgm[alias_cols].notna(), "").to_numpy()
+    alias_lists = [[alias for alias in (str(v).strip() for v in values) if alias] for values in alias_values]
+
+    # 1. 获取原始分数，并确保为浮点数，默认0 (无法转换的值也按0处理)
+    if "score" in df_bgm.columns:
+        original_scores = pd.to_numeric(df_bgm["score"], errors="coerce").fillna(0.0).astype(float).tolist()
+    else:
+        original_scores = [0.0] * len(df_bgm)
 
+    tasks: List[tuple[str, Dict[str, Any], List[str], float]] = []
+    for bgm_id, row, aliases, original_score in zip(bgm_ids, df_bgm.to_dict("records"), alias_lists, original_scores):
         if bgm_id in processed_ids:
-            print(f"跳过 ID {bgm_id} （已处理）")
+            log.debug("跳过 ID %s （已处理）", bgm_id)
             continue
+        tasks.append((bgm_id, row, aliases, original_score))
 
-        # 只用别名列进行匹配
-        alias_cols = [col for col in row.index if col.startswith("别名")]
-        aliases = [str(row[col]).strip() for col in alias_cols if pd.notna(row[col]) and str(row[col]).strip()]
-
-        # 1. 获取原始分数，并确保为浮点数，默认0
-        original_score = 0.0
-        if 'score' in row and pd.notna(row['score']):
-            try:
-                original_score = float(row['score'])
-            except (ValueError, TypeError):
-                pass # 如果转换失败，则保持0.0
-
-        print(f"\n正在匹配 ID {bgm_id} (别名: {aliases}) (原始分数: {original_score})")
+    def process_row(task: tuple[str, Dict[str, Any], List[str], float]) -> tuple[Optional[Dict[str, Any]], float, str]:
+        """在线程池中执行：只负责搜索接口调用，返回 (最佳匹配, 最高分, 匹配来源)。"""
+        bgm_id, _, aliases, original_score = task
+        log.debug("正在匹配 ID %s (别名: %s) (原始分数: %s)", bgm_id, aliases, original_score)
 
         # 2. 查找所有别名中的最佳匹配
         best_match = None
@@ -434,76 +1029,108 @@ def match_bgm_games_and_save(
                 best_match = matches[0]
                 best_score = best_match["score"]
                 match_source = f"别名{i+1}"
-        
-        # 3. 比较分数，决定使用新数据还是保留原始数据
-        if best_match and best_score > original_score:
-            print(f" - 别名匹配分数更高 ({best_score} > {original_score})。使用新数据。")
-            row_list: List[Dict[str, Any]] = []
-            # ---- 公司信息处理 (仅当别名更优时才查询) ----
-            org_id = str(best_match.get("orgId", ""))
-            org_info = None  # type: Optional[Dict[str, Any]]
-
-            if org_id:
-                should_retry = False
-                if org_id in processed_orgs:
-                    existing = processed_orgs[org_id]["info"]
-                    if not existing.get("website") or not existing.get("description"):
-                        should_retry = True
-                        processed_orgs[org_id]["retry_count"] += 1
-                else:
-                    should_retry = True
-                    processed_orgs[org_id] = {"info": {}, "retry_count": 1}
-
-                if should_retry and processed_orgs[org_id]["retry_count"] <= 3:
-                    org_info = get_organization_details(org_id, token_ref["value"])
-                    if org_info:
-                        processed_orgs[org_id]["info"] = org_info
-                        append_org_to_excel(org_info, org_output_file)
-                else:
-                    org_info = processed_orgs[org_id]["info"]
-
-            # ---- 组装新行数据 ----
-            row_data = {
-                "bgm_id": bgm_id,
-                "bgm游戏": row.get('bgm游戏') or row.get('原始bgm游戏名称'),
-                "name": best_match["name"],
-                "chineseName": best_match["chineseName"],
-                "ym_id": best_match["ym_id"],
-                "score": best_score,
-                "orgId": org_id,
-                "orgName": (org_info or {}).get("name", best_match.get("orgName", "")),
-                "orgWebsite": (org_info or {}).get("website", best_match.get("orgWebsite", "")),
-                "orgDescription": (org_info or {}).get("description", best_match.get("orgDescription", "")),
-                "匹配来源": match_source
-            }
-            row_list.append(row_data)
-            append_to_excel(row_list, output_file)
-        else:
-            # 如果原始分数更高，或别名未匹配成功
-            if best_match:
-                 print(f" - 原始分数 ({original_score}) 更高或相等 (别名最高分: {best_score})。保留原始数据。")
+        return best_match, best_score, match_source
+
+    # 6. 并发搜索，结果按原顺序交回主线程处理会社信息并写入
+    # 结果先写入缓冲区，每 FLUSH_EVERY 行追加一次，xlsx 在结束时统一保存；无论正常结束还是中途异常/中断都把剩余行写完
+    pending_matched: List[Dict[str, Any]] = []
+    pending_orgs: List[Dict[str, Any]] = []
+    org_fetcher = OrgFetchWorker(token_ref)
+    fetched_orgs: Dict[str, Dict[str, Any]] = {}
+
+    def save_fetched_orgs() -> None:
+        """把后台线程已查询到的会社信息立即写入 SQLite，并加入会社信息文件的缓冲区。"""
+        for org_id, org_info in org_fetcher.drain():
+            entry = org_store.get(org_id)
+            org_store.put(org_id, org_info, entry["retry_count"] if entry else 1)
+            fetched_orgs[org_id] = org_info
+            pending_orgs.append(org_info)
+        flush_if_full(pending_orgs, org_output_file)
+
+    executor = ThreadPoolExecutor(max_workers=MAX_WORKERS)
+    try:
+        results = executor.map(process_row, tasks)
+        for (bgm_id, row, _, original_score), (best_match, best_score, match_source) in tqdm(
+            zip(tasks, results), total=len(tasks), desc="处理游戏"
+        ):
+            save_fetched_orgs()
+            # 3. 比较分数，决定使用新数据还是保留原始数据
+            if best_match and best_score > original_score:
+                log.debug(" - 别名匹配分数更高 (%s > %s)。使用新数据。", best_score, original_score)
+                row_list: List[Dict[str, Any]] = []
+                # ---- 公司信息处理 (仅当别名更优时才查询) ----
+                org_id = str(best_match.get("orgId", ""))
+                org_info = None  # type: Optional[Dict[str, Any]]
+
+                # 先用已知的会社信息 (或搜索结果中的会社字段) 写入本行；需要查询时交给后台线程，
+                # 查询结果在全部行写完后统一回填 (见 patch_org_fields)
+                if org_id:
+                    entry = org_store.get(org_id)
+                    if entry is None:
+                        entry = {"info": {}, "retry_count": 0}
+                    org_info = entry["info"]
+                    if not org_info.get("website") or not org_info.get("description"):
+                        entry["retry_count"] += 1
+                        org_store.put(org_id, org_info, entry["retry_count"])
+                        if entry["retry_count"] <= 3:
+                            org_fetcher.submit(org_id)
+
+                # ---- 组装新行数据 ----
+                row_data = {
+                    "bgm_id": bgm_id,
+                    "bgm游戏": row.get('bgm游戏') or row.get('原始bgm游戏名称'),
+                    "name": best_match["name"],
+                    "chineseName": best_match["chineseName"],
+                    "ym_id": best_match["ym_id"],
+                    "score": best_score,
+                    "orgId": org_id,
+                    "orgName": (org_info or {}).get("name", best_match.get("orgName", "")),
+                    "orgWebsite": (org_info or {}).get("website", best_match.get("orgWebsite", "")),
+                    "orgDescription": (org_info or {}).get("description", best_match.get("orgDescription", "")),
+                    "匹配来源": match_source
+                }
+                row_list.append(row_data)
+                pending_matched.extend(row_list)
+                flush_if_full(pending_matched, output_file)
             else:
-                 print(f" - 未找到任何别名匹配项。保留原始数据。")
+                # 如果原始分数更高，或别名未匹配成功
+                if best_match:
+                     log.debug(" - 原始分数 (%s) 更高或相等 (别名最高分: %s)。保留原始数据。", original_score, best_score)
+                else:
+                     log.debug(" - 未找到任何别名匹配项。保留原始数据。")
            
-            # ---- 组装原始行数据 ----
-            row_data = {
-                "bgm_id": bgm_id,
-                "bgm游戏": row.get('bgm游戏') or row.get('原始bgm游戏名称'),
-                "name": row.get('name'),
-                "chineseName": row.get('chineseName'),
-                "ym_id": row.get('ym_id'),
-                "score": original_score,
-                "orgId": row.get('orgId'),
-                "orgName": row.get('orgName'),
-                "orgWebsite": row.get('orgWebsite'),
-                "orgDescription": row.get('orgDescription'),
-                "匹配来源": "原始"
-            }
-            row_list = [row_data]
-            append_to_excel(row_list, output_file)
-
-        # 避免触发接口限流
-        time.sleep(0.001)
+                # ---- 组装原始行数据 ----
+                row_data = {
+                    "bgm_id": bgm_id,
+                    "bgm游戏": row.get('bgm游戏') or row.get('原始bgm游戏名称'),
+                    "name": row.get('name'),
+                    "chineseName": row.get('chineseName'),
+                    "ym_id": row.get('ym_id'),
+                    "score": original_score,
+                    "orgId": row.get('orgId'),
+                    "orgName": row.get('orgName'),
+                    "orgWebsite": row.get('orgWebsite'),
+                    "orgDescription": row.get('orgDescription'),
+                    "匹配来源": "原始"
+                }
+                row_list = [row_data]
+                pending_matched.extend(row_list)
+                flush_if_full(pending_matched, output_file)
+    finally:
+        # 中断时取消尚未开始的搜索，已在进行的请求结束后再退出
+        executor.shutdown(wait=True, cancel_futures=True)
+        # 先把已匹配的行写入磁盘，再等待 (可能较慢的) 后台会社查询，等待期间再次中断也不会丢失这些行
+        flush_pending(pending_matched, output_file)
+        save_workbooks()
+        try:
+            org_fetcher.close()
+        finally:
+            save_fetched_orgs()
+            flush_pending(pending_orgs, org_output_file)
+            save_workbooks()
+            org_store.close()
+        # 会社查询全部结束后回填到匹配结果中
+        patch_org_fields(output_file, fetched_orgs)
 
     print("\n所有匹配结果已保存。🎉")
 
@@ -512,9 +1139,15 @@ def match_bgm_games_and_save(
 # 二次匹配：月幕 -> Bangumi 额外信息
 ###############################################################################
 
-def calculate_similarity(str1: str, str2: str) -> float:
-    """利用 ``difflib.SequenceMatcher`` 计算字符串相似度。"""
-    return SequenceMatcher(None, str1.lower(), str2.lower()).ratio()
+def _ratio_prenormalized(str1: str, str2: str) -> float:
+    """
+    计算两个 **已转为小写** 的字符串的相似度；调用方应对整列名称预先统一做一次 ``lower()``。
+    优先使用 ``Levenshtein.ratio`` (C 实现，没有 ``SequenceMatcher`` 的最坏平方复杂度和 autojunk 启发式)，
+    未安装时回退到 ``difflib.SequenceMatcher``。
+    """
+    if levenshtein_ratio is not None:
+        return levenshtein_ratio(str1, str2)
+    return SequenceMatcher(None, str1, str2).ratio()
 
 
 def match_ym_with_bangumi(
@@ -524,28 +1157,34 @@ def match_ym_with_bangumi(
 ) -> None:
     """
     按名称相似度将 **月幕游戏** 与 **Bangumi 游戏** 对齐，并输出 CSV 文件。
+    ``ym_file`` 可以是首次匹配输出的 xlsx 或 csv。
     """
-    print("开始匹配月幕游戏与 Bangumi 游戏…")
+    log.info("开始匹配月幕游戏与 Bangumi 游戏…")
 
     # 1. 读取两侧数据
-    ym_df = pd.read_excel(ym_file)
+    ym_df = read_table(ym_file)
     bg_df = pd.read_excel(bangumi_file)
 
+    # 名称整列统一转一次小写，内层循环直接比较，不再为每一对名称各做两次 lower()
+    ym_names_lc = ym_df["name"].astype(str).str.lower().tolist()
+    bg_names_lc = bg_df["游戏名称"].astype(str).str.lower().tolist()
+
     results = []
 
     # 2. 遍历月幕条目
-    for _, ym_row in ym_df.iterrows():
+    for (_, ym_row), ym_name_lc in zip(ym_df.iterrows(), ym_names_lc):
         ym_name = ym_row["name"]
         ym_cn_name = ym_row["chineseName"]
         ym_id = ym_row["ym_id"]
 
-        best_match, best_score = None, 0.0
-        for _, bg_row in bg_df.iterrows():
-            score = calculate_similarity(ym_name, bg_row["游戏名称"])
+        best_j, best_score = -1, 0.0
+        for j, bg_name_lc in enumerate(bg_names_lc):
+            score = _ratio_prenormalized(ym_name_lc, bg_name_lc)
             if score > best_score:
-                best_match, best_score = bg_row, score
+                best_j, best_score = j, score
 
-        if best_match is not None and best_score >= 0.8:
+        if best_j >= 0 and best_score >= 0.8:
+            best_match = bg_df.iloc[best_j]
             results.append({
                 "ym_id": ym_id,
                 "ym_name": ym_name,
@@ -558,7 +1197,7 @@ def match_ym_with_bangumi(
                 "bangumi_summary": best_match.get("简介", ""),
                 "match_score": round(best_score, 4)
             })
-            print(f"匹配成功：{ym_name} -> {best_match['游戏名称']} (得分: {best_score:.4f})")
+            log.debug("匹配成功：%s -> %s (得分: %.4f)", ym_name, best_match['游戏名称'], best_score)
 
     pd.DataFrame(results).to_csv(output_file, index=False, encoding="utf-8-sig")
     print(f"\n匹配结果已保存到：{output_file}  (共 {len(results)} 条)")
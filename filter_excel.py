@@ -1,17 +1,87 @@
 import pandas as pd
+from openpyxl import load_workbook
 from datetime import datetime
 import os
 import argparse
 import re
 import sys
+from typing import Optional
 
-def filter_excel_by_score(input_file: str, score_threshold: float):
+try:
+    import python_calamine  # noqa: F401  Rust 实现的 xlsx 解析器，读取速度远快于 openpyxl
+    _EXCEL_ENGINE = 'calamine'
+except ImportError:
+    _EXCEL_ENGINE = None  # 未安装时回退到 pandas 默认引擎
+
+try:
+    import xlsxwriter  # noqa: F401  写 xlsx 比 openpyxl 快且更省内存
+    _EXCEL_WRITER_ENGINE = 'xlsxwriter'
+except ImportError:
+    _EXCEL_WRITER_ENGINE = None  # 未安装时回退到 pandas 默认引擎 (openpyxl)
+
+OUTPUT_FORMATS = ('xlsx', 'csv', 'parquet')
+
+try:
+    import pyarrow  # noqa: F401
+    # Arrow 字符串列：内存占用远小于 object 列，.str.* 操作由 Arrow 的 C++ 内核完成
+    _STRING_DTYPE = 'string[pyarrow]'
+except ImportError:
+    _STRING_DTYPE = 'string'
+
+# 别名列支持的分隔符：顿号、中英文逗号、分号、中英文冒号、竖线
+_ALIAS_SEPARATORS = '、,，;:：|'
+# 首尾的分隔符及空白
+_ALIAS_EDGE_RE = re.compile(rf'^[\s{_ALIAS_SEPARATORS}]+|[\s{_ALIAS_SEPARATORS}]+$')
+# 一段连续的分隔符（连同两侧空白）视为一次拆分
+_ALIAS_SPLIT_RE = re.compile(rf'\s*[{_ALIAS_SEPARATORS}][\s{_ALIAS_SEPARATORS}]*')
+
+def save_dataframe(df: pd.DataFrame, output_file: str, output_format: str = 'xlsx') -> str:
+    """
+    按 output_format 保存 df，返回实际写入的文件路径（扩展名随格式调整）。
+    - 'xlsx'：优先使用 xlsxwriter 引擎。没有开启 constant_memory，
+      因为 pandas 按列写单元格，而该模式只能按行顺序写入，会丢数据。
+    - 'csv' / 'parquet'：下游不需要 Excel 时使用，写出快得多、文件也更小（parquet 需要 pyarrow）。
+    """
+    if output_format not in OUTPUT_FORMATS:
+        raise ValueError(f"不支持的输出格式: {output_format}，可选: {OUTPUT_FORMATS}")
+
+    output_file = f"{os.path.splitext(output_file)[0]}.{output_format}"
+    if output_format == 'parquet':
+        df.to_parquet(output_file, index=False)
+    elif output_format == 'csv':
+        df.to_csv(output_file, index=False, encoding='utf-8-sig')
+    else:
+        df.to_excel(output_file, index=False, engine=_EXCEL_WRITER_ENGINE)
+    return output_file
+
+def default_filtered_output_file(score_threshold: float) -> str:
+    """filter 任务的默认输出文件名，文件名中带上阈值和时间戳。"""
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    return f"ymgames_matched_filtered_score_gt_{str(score_threshold).replace('.', '_')}_{timestamp}.xlsx"
+
+def default_aliases_output_file(input_file: str) -> str:
+    """process_alias 任务的默认输出文件名：<输入文件名>_processed_aliases_<时间戳>.xlsx"""
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    base_name = os.path.basename(input_file).split('.')[0]
+    return f"{base_name}_processed_aliases_{timestamp}.xlsx"
+
+def filter_excel_by_score(
+    input_file: str,
+    score_threshold: float,
+    output_file: Optional[str] = None,
+    output_format: str = 'xlsx'
+):
     """
     筛选Excel文件，保留score得分大于指定阈值的行。
+
+    output_file 为 None 时不写文件，直接返回筛选后的 DataFrame（供 notebook / 流水线继续使用）；
+    否则保存到 output_file 并返回实际写入的路径。
     """
     print(f"正在读取文件: {input_file}")
+    # 以只读模式逐行流式读取，边读边按分数过滤，只把保留下来的行构造成 DataFrame，
+    # 峰值内存与筛选结果成正比，而不是与整个源文件成正比。
     try:
-        df = pd.read_excel(input_file)
+        wb = load_workbook(input_file, read_only=True, data_only=True)
     except FileNotFoundError:
         print(f"错误: 文件 '{input_file}' 未找到。请确保文件路径正确。")
         return
@@ -19,14 +89,33 @@ def filter_excel_by_score(input_file: str, score_threshold: float):
         print(f"读取Excel文件时出错: {e}")
         return
 
-    if 'score' not in df.columns:
-        print("错误: Excel文件中未找到 'score' 列。请检查列名。")
+    try:
+        rows = wb.active.iter_rows(values_only=True)
+        header = list(next(rows, ()))
+        if 'score' not in header:
+            print("错误: Excel文件中未找到 'score' 列。请检查列名。")
+            return
+        score_idx = header.index('score')
+
+        print(f"正在筛选 'score' > {score_threshold} 的行...")
+        total_rows = 0
+        kept = []
+        for row in rows:
+            if all(v is None for v in row):
+                continue  # 跳过空行，与 read_excel 的行数保持一致
+            total_rows += 1
+            score = row[score_idx] if score_idx < len(row) else None
+            # 只接受数值类型的分数（bool 除外），与原先的数值比较语义一致
+            if isinstance(score, (int, float)) and not isinstance(score, bool) and score > score_threshold:
+                kept.append(row)
+    except Exception as e:
+        print(f"读取Excel文件时出错: {e}")
         return
+    finally:
+        wb.close()
 
-    print(f"原始数据包含 {len(df)} 行。")
-    # 过滤得分大于阈值的行
-    print(f"正在筛选 'score' > {score_threshold} 的行...")
-    filtered_df = df[df['score'] > score_threshold].copy() # 使用 .copy() 避免 SettingWithCopyWarning
+    print(f"原始数据包含 {total_rows} 行。")
+    filtered_df = pd.DataFrame(kept, columns=header)
 
     if filtered_df.empty:
         print(f"没有找到 'score' 大于 {score_threshold} 的数据。")
@@ -37,28 +126,39 @@ def filter_excel_by_score(input_file: str, score_threshold: float):
     # filtered_df['ym_id'] = filtered_df['ym_id'].astype(str)
 
 
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    # 更新输出文件名以反映新的阈值
-    output_file = f"ymgames_matched_filtered_score_gt_{str(score_threshold).replace('.', '_')}_{timestamp}.xlsx"
+    if output_file is None:
+        return filtered_df
 
     try:
-        filtered_df.to_excel(output_file, index=False)
+        output_file = save_dataframe(filtered_df, output_file, output_format)
         print(f"已将 {len(filtered_df)} 行数据保存到: {output_file}")
+        return output_file
     except Exception as e:
         print(f"保存筛选结果时出错: {e}")
 
 
-def process_and_filter_for_aliases(input_file: str, score_limit: float):
+def process_and_filter_for_aliases(
+    input_file: str,
+    score_limit: float,
+    output_file: Optional[str] = None,
+    output_format: str = 'xlsx',
+    verbose: bool = False
+):
     """
     处理指定Excel文件：
     1. 筛选出'别名'列存在内容且'score' <= score_limit 的行。
     2. 使用正则表达式拆分'别名'列。
     3. 保存到新文件。
+
+    output_file 为 None 时跳过第3步，直接返回处理后的 DataFrame；
+    否则保存到 output_file 并返回实际写入的路径。
+
+    verbose=True 时额外输出原始数据的诊断信息（列类型、score 统计等）。
     """
     print(f"--- 开始处理别名并筛选文件: {input_file} ---")
     
     try:
-        df = pd.read_excel(input_file)
+        df = pd.read_excel(input_file, engine=_EXCEL_ENGINE)
         print(f"成功读取文件，包含 {len(df)} 行。")
     except FileNotFoundError:
         print(f"错误: 文件 '{input_file}' 未找到。")
@@ -73,27 +173,38 @@ def process_and_filter_for_aliases(input_file: str, score_limit: float):
         print(f"错误: 文件中必须包含 {required_cols} 列。当前列: {df.columns.tolist()}")
         return
 
-    print("\n--- Debug: 原始数据诊断 ---")
-    print("列的数据类型:")
-    df.info(verbose=False)
-    print("\n'score'列的统计信息:")
-    print(df['score'].describe())
-    print(f"\n'别名'列非空值的数量: {df['别名'].notna().sum()}")
+    # score 按数值处理，无法解析的值记为 NaN (统计与筛选都会跳过)
+    # read_excel 读出的 score 通常已是 float64，此时无需再做一次整列的 to_numeric
+    score_is_numeric = pd.api.types.is_numeric_dtype(df['score'])
+    score_num = df['score'] if score_is_numeric else pd.to_numeric(df['score'], errors='coerce')
+
+    if verbose:
+        print("\n--- Debug: 原始数据诊断 ---")
+        print("列的数据类型:")
+        df.info(verbose=False)
+        print("\n'score'列的统计信息:")
+        # describe() 计算分位数需要排序，这里只取 O(n) 的统计量
+        print(score_num.agg(['min', 'max', 'count', 'mean']))
+        print(f"\n'别名'列非空值的数量: {df['别名'].notna().sum()}")
 
     # 1. 筛选
     print(f"\n--- 正在筛选 ---")
-    print(f"筛选条件: '别名'列不为空 且 'score' <= {score_limit}")
+    print(f"筛选条件: 'score' <= {score_limit} 且 '别名'列不为空")
     
-    # 筛选条件1: 别名列存在且不为空字符串
-    df_with_alias = df[df['别名'].notna() & (df['别名'].astype(str).str.strip() != '')].copy()
-    print(f"Debug: 步骤1 (筛选有别名的行) 后剩下: {len(df_with_alias)} 行")
-    
-    # 在继续之前，确保score是数字类型
-    df_with_alias['score'] = pd.to_numeric(df_with_alias['score'], errors='coerce')
-    
-    # 筛选条件2: score <= 0.9
-    filtered_df = df_with_alias[df_with_alias['score'] <= score_limit].copy()
-    print(f"Debug: 步骤2 (在有别名的基础上，筛选 score <= {score_limit}) 后剩下: {len(filtered_df)} 行")
+    # 筛选条件1: score <= score_limit
+    # 先用廉价的数值比较缩小范围，再对剩下的行做开销较大的字符串处理
+    df_in_range = df.loc[score_num <= score_limit]
+    if not score_is_numeric:
+        df_in_range = df_in_range.assign(score=score_num.loc[df_in_range.index])
+    print(f"Debug: 步骤1 (筛选 score <= {score_limit}) 后剩下: {len(df_in_range)} 行")
+
+    # 筛选条件2: 别名列存在且不为空字符串
+    # 只做一次 strip，结果既用于生成掩码，也直接作为后续拆分的输入
+    alias_stripped = df_in_range['别名'].astype(_STRING_DTYPE).str.strip()
+    has_alias = alias_stripped.notna() & alias_stripped.str.len().gt(0)
+    # 布尔索引本身就会生成新的 DataFrame，后续也不会原地修改它，无需再 .copy() 一份
+    filtered_df = df_in_range.loc[has_alias].assign(别名=alias_stripped.loc[has_alias])
+    print(f"Debug: 步骤2 (在 score 符合的基础上，筛选有别名的行) 后剩下: {len(filtered_df)} 行")
 
     if filtered_df.empty:
         print("\n--- 筛选失败：没有找到任何符合条件的数据 ---")
@@ -107,8 +218,7 @@ def process_and_filter_for_aliases(input_file: str, score_limit: float):
             print(f"\n     python filter_excel.py process_alias 主表_updated.xlsx\n")
         else:
              # 如果别名存在，但分数不匹配
-            numeric_score = pd.to_numeric(df['score'], errors='coerce')
-            score_condition_count = (numeric_score <= score_limit).sum()
+            score_condition_count = (score_num <= score_limit).sum()
             print(f"\n[!!] 诊断信息: 文件中有 {alias_condition_count} 行包含别名，但没有一行的 'score' 值小于或等于 {score_limit}。")
             print(f"     (文件中 'score' <= {score_limit} 的总行数为: {score_condition_count})")
         return
@@ -118,32 +228,38 @@ def process_and_filter_for_aliases(input_file: str, score_limit: float):
     # 2. 拆分别名列
     print("\n正在拆分 '别名' 列...")
     
-    # 使用正则表达式来处理多种可能的分隔符
-    aliases_series = filtered_df['别名'].apply(
-        lambda x: [alias.strip() for alias in re.split(r'[、,，;:：|]', str(x)) if alias.strip()]
+    # 使用向量化的 str.split 一次性处理多种可能的分隔符：
+    # 先去掉首尾的分隔符/空白，再按"分隔符及其两侧空白"整体拆分，
+    # 这样连续分隔符不会产生空的别名，结果与逐行 re.split + strip 一致。
+    # 此时'别名'列已经是去除首尾空白后的非空字符串。
+    parts = (
+        filtered_df['别名']
+        .str.replace(_ALIAS_EDGE_RE, '', regex=True)
+        .str.split(_ALIAS_SPLIT_RE, expand=True, regex=True)
     )
-    
-    if aliases_series.empty or aliases_series.apply(len).sum() == 0:
+    # 去掉完全为空的列（例如只含分隔符的别名产生的空列），之后只需看列数即可判断是否拆分出了别名
+    parts = parts.apply(lambda s: s.str.strip()).replace('', pd.NA).dropna(axis=1, how='all')
+
+    if parts.shape[1] == 0:
         print("警告：'别名'列在筛选后为空或无法拆分，将只保存筛选结果。")
         final_df = filtered_df
     else:
-        # 创建新的别名DataFrame
-        alias_df_new = pd.DataFrame(aliases_series.tolist(), index=filtered_df.index)
         # 为新别名列命名
-        alias_df_new.columns = [f'别名{i+1}' for i in range(alias_df_new.shape[1])]
+        parts.columns = [f'别名{i+1}' for i in range(parts.shape[1])]
         # 合并回主DataFrame，并删除原始的'别名'列
-        final_df = pd.concat([filtered_df.drop('别名', axis=1), alias_df_new], axis=1)
-        print(f"成功将'别名'拆分为 {alias_df_new.shape[1]} 个新列。")
+        # parts 沿用了 filtered_df 的索引，按列拼接时无需重新对齐
+        final_df = pd.concat([filtered_df.drop(columns=['别名']), parts], axis=1)
+        print(f"成功将'别名'拆分为 {parts.shape[1]} 个新列。")
 
 
     # 3. 保存结果
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    base_name = os.path.basename(input_file).split('.')[0]
-    output_file = f"{base_name}_processed_aliases_{timestamp}.xlsx"
+    if output_file is None:
+        return final_df
 
     try:
-        final_df.to_excel(output_file, index=False)
+        output_file = save_dataframe(final_df, output_file, output_format)
         print(f"处理完成！已将 {len(final_df)} 行数据保存到: {output_file}")
+        return output_file
     except Exception as e:
         print(f"保存结果时出错: {e}")
 
@@ -154,7 +270,8 @@ if __name__ == "__main__":
         print("--- 未提供任何命令行参数，将以默认设置执行'处理别名'任务 ---")
         process_and_filter_for_aliases(
             input_file="主表_updated.xlsx",
-            score_limit=0.9
+            score_limit=0.9,
+            output_file=default_aliases_output_file("主表_updated.xlsx")
         )
     else:
         # 否则，使用我们之前定义的、更灵活的命令行解析逻辑
@@ -179,6 +296,12 @@ if __name__ == "__main__":
             default=0.5,
             help="分数的阈值，只保留大于此值的行。(默认: 0.5)"
         )
+        parser_filter.add_argument(
+            "--output_format",
+            choices=OUTPUT_FORMATS,
+            default='xlsx',
+            help="输出文件格式。(默认: xlsx)"
+        )
 
         # 任务2: process_alias - 筛选并拆分别名
         parser_alias = subparsers.add_parser('process_alias', help="筛选(score<=上限, 有别名)并拆分别名列 (新功能)")
@@ -194,10 +317,32 @@ if __name__ == "__main__":
             default=0.9,
             help="分数的上限，只保留小于或等于此值的行。(默认: 0.9)"
         )
+        parser_alias.add_argument(
+            "--output_format",
+            choices=OUTPUT_FORMATS,
+            default='xlsx',
+            help="输出文件格式。(默认: xlsx)"
+        )
+        parser_alias.add_argument(
+            "--verbose",
+            action='store_true',
+            help="输出原始数据的诊断信息。"
+        )
 
         args = parser.parse_args()
 
         if args.task == 'filter':
-            filter_excel_by_score(input_file=args.input_file, score_threshold=args.threshold)
+            filter_excel_by_score(
+                input_file=args.input_file,
+                score_threshold=args.threshold,
+                output_file=default_filtered_output_file(args.threshold),
+                output_format=args.output_format
+            )
         elif args.task == 'process_alias':
-            process_and_filter_for_aliases(input_file=args.input_file, score_limit=args.score_limit) 
\ No newline at end of file
+            process_and_filter_for_aliases(
+                input_file=args.input_file,
+                score_limit=args.score_limit,
+                output_file=default_aliases_output_file(args.input_file),
+                output_format=args.output_format,
+                verbose=args.verbose
+            ) 
\ No newline at end of file